@@ -1,15 +1,21 @@
-import json
-import time
-import urllib.error
-import urllib.parse
-import urllib.request
 from typing import Any
 
+import requests
+from lxml import etree
 from pydantic import BaseModel, Field
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from core.tools.entities.tool_entities import ToolInvokeMessage
 from core.tools.tool.builtin_tool import BuiltinTool
 
+# compiled once, the paths are anchored at PubmedArticle so the evaluation does not walk the
+# reference lists and translated abstracts like a `.//` descendant search would
+ARTICLE_TITLE_XPATH = etree.XPath("MedlineCitation/Article/ArticleTitle")
+ABSTRACT_TEXT_XPATH = etree.XPath("MedlineCitation/Article/Abstract/AbstractText")
+PUB_DATE_XPATH = etree.XPath("MedlineCitation/Article/Journal/JournalIssue/PubDate")
+PMID_XPATH = etree.XPath("string(MedlineCitation/PMID)", smart_strings=False)
+
 
 class PubMedAPIWrapper(BaseModel):
     """
@@ -28,10 +34,11 @@ class PubMedAPIWrapper(BaseModel):
           if False: the `metadata` gets only the most informative fields.
     """
 
-    base_url_esearch: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?"
-    base_url_efetch: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi?"
+    base_url_esearch: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+    base_url_efetch: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
     max_retry: int = 5
     sleep_time: float = 0.2
+    efetch_batch_size: int = 200
 
     # Default values for the parameters
     top_k_results: int = 3
@@ -71,91 +78,99 @@ class PubMedAPIWrapper(BaseModel):
         Return a list of dictionaries containing the document metadata.
         """
 
-        url = (
-            self.base_url_esearch
-            + "db=pubmed&term="
-            + str({urllib.parse.quote(query)})
-            + f"&retmode=json&retmax={self.top_k_results}&usehistory=y"
-        )
-        result = urllib.request.urlopen(url)
-        text = result.read().decode("utf-8")
-        json_text = json.loads(text)
+        with self._create_session() as session:
+            response = session.get(self.base_url_esearch, params={
+                "db": "pubmed",
+                "term": query,
+                "retmode": "json",
+                "retmax": self.top_k_results,
+                "usehistory": "y",
+            }, timeout=30)
+            response.raise_for_status()
+            json_text = response.json()
 
-        articles = []
-        webenv = json_text["esearchresult"]["webenv"]
-        for uid in json_text["esearchresult"]["idlist"]:
-            article = self.retrieve_article(uid, webenv)
-            articles.append(article)
+            webenv = json_text["esearchresult"]["webenv"]
+            articles = self.retrieve_articles(session, json_text["esearchresult"]["idlist"], webenv)
 
         # Convert the list of articles to a JSON string
         return articles
 
-    def retrieve_article(self, uid: str, webenv: str) -> dict:
-        url = (
-            self.base_url_efetch
-            + "db=pubmed&retmode=xml&id="
-            + uid
-            + "&webenv="
-            + webenv
+    def _create_session(self) -> requests.Session:
+        """
+        Create a session which keeps the connection to NCBI alive across the search and
+        fetch requests, and retries Too Many Requests and server errors with an
+        exponential, jittered backoff. The backoff state lives in the session, so a
+        burst of 429s does not slow down later searches.
+        """
+        retry = Retry(
+            total=self.max_retry,
+            backoff_factor=self.sleep_time,
+            backoff_jitter=self.sleep_time,
+            status_forcelist=[429, 500, 502, 503, 504],
         )
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        return session
+
+    def retrieve_articles(self, session: requests.Session, uids: list[str], webenv: str) -> list[dict]:
+        """
+        Fetch the articles with one EFetch request per batch of uids instead of one request
+        per article, NCBI recommends at most 200 ids per request.
+        """
+        articles = []
+        for i in range(0, len(uids), self.efetch_batch_size):
+            with session.get(self.base_url_efetch, params={
+                "db": "pubmed",
+                "retmode": "xml",
+                "id": ",".join(uids[i:i + self.efetch_batch_size]),
+                "webenv": webenv,
+            }, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+
+                # parse the articles while the response is still downloading, and drop every
+                # article once it is converted so the tree never holds the whole batch
+                for _, element in etree.iterparse(
+                    response.raw,
+                    events=("end",),
+                    tag="PubmedArticle",
+                    resolve_entities=False,
+                    no_network=True,
+                ):
+                    articles.append(self._parse_article(element))
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
 
-        retry = 0
-        while True:
-            try:
-                result = urllib.request.urlopen(url)
-                break
-            except urllib.error.HTTPError as e:
-                if e.code == 429 and retry < self.max_retry:
-                    # Too Many Requests error
-                    # wait for an exponentially increasing amount of time
-                    print(
-                        f"Too Many Requests, "
-                        f"waiting for {self.sleep_time:.2f} seconds..."
-                    )
-                    time.sleep(self.sleep_time)
-                    self.sleep_time *= 2
-                    retry += 1
-                else:
-                    raise e
-
-        xml_text = result.read().decode("utf-8")
+        return articles
 
+    def _parse_article(self, element: etree._Element) -> dict:
         # Get title
-        title = ""
-        if "<ArticleTitle>" in xml_text and "</ArticleTitle>" in xml_text:
-            start_tag = "<ArticleTitle>"
-            end_tag = "</ArticleTitle>"
-            title = xml_text[
-                xml_text.index(start_tag) + len(start_tag) : xml_text.index(end_tag)
-            ]
+        title = "".join(self._get_text(e) for e in ARTICLE_TITLE_XPATH(element))
 
-        # Get abstract
-        abstract = ""
-        if "<AbstractText>" in xml_text and "</AbstractText>" in xml_text:
-            start_tag = "<AbstractText>"
-            end_tag = "</AbstractText>"
-            abstract = xml_text[
-                xml_text.index(start_tag) + len(start_tag) : xml_text.index(end_tag)
-            ]
+        # Get abstract, structured abstracts are split into several labelled sections
+        abstract = "\n".join(self._get_text(e) for e in ABSTRACT_TEXT_XPATH(element))
 
         # Get publication date
-        pub_date = ""
-        if "<PubDate>" in xml_text and "</PubDate>" in xml_text:
-            start_tag = "<PubDate>"
-            end_tag = "</PubDate>"
-            pub_date = xml_text[
-                xml_text.index(start_tag) + len(start_tag) : xml_text.index(end_tag)
-            ]
+        pub_date = "".join(self._get_text(e) for e in PUB_DATE_XPATH(element))
 
         # Return article as dictionary
         article = {
-            "uid": uid,
+            "uid": PMID_XPATH(element),
             "title": title,
             "summary": abstract,
             "pub_date": pub_date,
         }
         return article
 
+    @staticmethod
+    def _get_text(element: etree._Element) -> str:
+        """
+        Return the whitespace-normalized text of an element, including the text
+        of inline markup such as <i> or <sup>.
+        """
+        return " ".join("".join(element.itertext()).split())
+
 
 class PubmedQueryRun(BaseModel):
     """Tool that searches the PubMed API."""
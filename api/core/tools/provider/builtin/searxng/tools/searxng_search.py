@@ -7,18 +7,6 @@ from core.tools.entities.tool_entities import ToolInvokeMessage
 from core.tools.tool.builtin_tool import BuiltinTool
 
 
-class SearXNGSearchResults(dict):
-    """Wrapper for search results."""
-
-    def __init__(self, data: str):
-        super().__init__(json.loads(data))
-        self.__dict__ = self
-
-    @property
-    def results(self) -> Any:
-        return self.get("results", [])
-
-
 class SearXNGSearchTool(BuiltinTool):
     """
     Tool for performing a search using SearXNG engine.
@@ -57,36 +45,29 @@ class SearXNGSearchTool(BuiltinTool):
             "q": query, 
             "format": "json", 
             "categories": self.SEARCH_TYPE[search_type]
-        })
+        }, timeout=(10, 60))
 
         if response.status_code != 200:
             raise Exception(f'Error {response.status_code}: {response.text}')
         
-        search_results = SearXNGSearchResults(response.text).results[:topK]
+        search_results = json.loads(response.content).get("results", [])[:topK]
 
         if result_type == 'link':
-            results = []
+            link_field = self.LINK_FILED[search_type]
             if search_type == "page" or search_type == "news":
-                for r in search_results:
-                    results.append(self.create_text_message(
-                        text=f'{r["title"]}: {r.get(self.LINK_FILED[search_type], "")}'
-                    ))
+                return [
+                    self.create_text_message(text=f'{r["title"]}: {r.get(link_field, "")}')
+                    for r in search_results
+                ]
             elif search_type == "image":
-                for r in search_results:
-                    results.append(self.create_image_message(
-                        image=r.get(self.LINK_FILED[search_type], "")
-                    ))
+                return [self.create_image_message(image=r.get(link_field, "")) for r in search_results]
             else:
-                for r in search_results:
-                    results.append(self.create_link_message(
-                        link=r.get(self.LINK_FILED[search_type], "")
-                    ))
-
-            return results
+                return [self.create_link_message(link=r.get(link_field, "")) for r in search_results]
         else:
-            text = ''
-            for i, r in enumerate(search_results):
-                text += f'{i+1}: {r["title"]} - {r.get(self.TEXT_FILED[search_type], "")}\n'
+            text_field = self.TEXT_FILED[search_type]
+            text = ''.join(
+                f'{i+1}: {r["title"]} - {r.get(text_field, "")}\n' for i, r in enumerate(search_results)
+            )
 
             return self.create_text_message(text=self.summary(user_id=user_id, content=text))
 
@@ -1,3 +1,4 @@
+import logging
 from typing import Any
 
 import requests
@@ -5,6 +6,8 @@ import requests
 from core.tools.entities.tool_entities import ToolInvokeMessage
 from core.tools.tool.builtin_tool import BuiltinTool
 
+logger = logging.getLogger(__name__)
+
 TAVILY_API_URL = "https://api.tavily.com"
 
 
@@ -45,7 +48,7 @@ class TavilySearch:
         else:
             params['include_domains'] = []
         
-        response = requests.post(f"{TAVILY_API_URL}/search", json=params)
+        response = requests.post(f"{TAVILY_API_URL}/search", json=params, timeout=(10, 60))
         response.raise_for_status()
         return response.json()
 
@@ -111,7 +114,7 @@ class TavilySearchTool(BuiltinTool):
             return self.create_text_message("Please input query")
         tavily_search = TavilySearch(api_key)
         results = tavily_search.results(tool_parameters)
-        print(results)
+        logger.debug("Tavily search results for %s: %s", query, results)
         if not results:
             return self.create_text_message(f"No results found for '{query}' in Tavily")
         else: